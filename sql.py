@@ -1,707 +1,1423 @@
-#!/usr/bin/env python3
-import json, os, re, sys, argparse, shutil, time, getpass
-from typing import Any, Dict, List, Tuple, Optional
-
-DATA_DIR_DEFAULT = "data"
-
-# ---------- Path helpers ----------
-def _p(data_dir: str, table: str, ext: str) -> str:
-    return os.path.join(data_dir, f"{table}.{ext}")
-
-def _load_json(path: str, default):
-    if not os.path.exists(path):
-        return default
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
-
-def _save_json(path: str, obj):
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(obj, f, ensure_ascii=False)
-
-# ---------- Parse & types ----------
-def _parse_value(s: str) -> Any:
-    s = s.strip()
-    if len(s) >= 2 and ((s[0] == "'" and s[-1] == "'") or (s[0] == '"' and s[-1] == '"')):
-        return s[1:-1]
-    if s.lower() in ("true", "false"):
-        return s.lower() == "true"
-    if s.lower() in ("null", "none"):
-        return None
-    try:
-        if "." in s:
-            return float(s)
-        return int(s)
-    except ValueError:
-        return s
-
-def _coerce_single_value(v: Any, typ: str) -> Any:
-    if v is None:
-        return None
-    if typ == "int":
-        return int(v)
-    if typ == "float":
-        return float(v)
-    if typ == "bool":
-        if isinstance(v, str):
-            return v.lower() == "true"
-        return bool(v)
-    return str(v)
-
-def _merge_versions(base: Dict[str, Any], newer: Dict[str, Any]) -> Dict[str, Any]:
-    """
-    Apply newer values on top of base; newer None means "no change".
-    """
-    out = dict(base)
-    for k, v in newer.items():
-        if v is not None:
-            out[k] = v
-    return out
-
-# ---------- Table renderer (pure Python) ----------
-def _truncate(s: str, width: int) -> str:
-    s = "" if s is None else str(s)
-    if width <= 3:
-        return s[:width]
-    return s if len(s) <= width else s[: width - 2] + "…"
-
-def _compute_widths(headers: List[str], rows: List[List[str]], max_col_width: int, term_width: Optional[int], padding: int = 1) -> List[int]:
-    widths = [len(h) for h in headers]
-    for r in rows:
-        for i, v in enumerate(r):
-            widths[i] = max(widths[i], len(v))
-    widths = [min(w, max_col_width) for w in widths]
-    total = 1
-    for w in widths:
-        total += padding + w + padding + 1
-    if term_width and total > term_width:
-        overflow = total - term_width
-        candidates = [i for i, w in enumerate(widths) if w > 8]
-        while overflow > 0 and candidates:
-            for i in list(candidates):
-                if widths[i] > 8 and overflow > 0:
-                    widths[i] -= 1
-                    overflow -= 1
-                if widths[i] <= 8 and i in candidates:
-                    candidates.remove(i)
-            if not any(widths[i] > 8 for i in candidates):
-                break
-    return widths
-
-def _draw_line(widths: List[int], chars: Tuple[str, str, str, str, str]) -> str:
-    left, mid, cross, right, fill = chars
-    parts = [left]
-    for i, w in enumerate(widths):
-        parts.append(fill * (w + 2))
-        parts.append(cross if i < len(widths) - 1 else right)
-    return "".join(parts)
-
-def _draw_row(values: List[str], widths: List[int], padding: int, vert: str) -> str:
-    out = [vert]
-    for i, v in enumerate(values):
-        cell = " " * padding + v.ljust(widths[i]) + " " * padding
-        out.append(cell)
-        out.append(vert)
-    return "".join(out)
-
-def _render_table(headers: List[str], rows: List[List[str]], max_col_width: int = 48, use_ascii: bool = False) -> str:
-    if use_ascii:
-        top = ("+", "+", "+", "+", "-")
-        mid = ("+", "+", "+", "+", "-")
-        bot = ("+", "+", "+", "+", "-")
-        vert = "|"
-    else:
-        top = ("┌", "┬", "┬", "┐", "─")
-        mid = ("├", "┼", "┼", "┤", "─")
-        bot = ("└", "┴", "┴", "┘", "─")
-        vert = "│"
-
-    try:
-        term_width = shutil.get_terminal_size().columns
-    except Exception:
-        term_width = None
-
-    padding = 1
-    raw_rows = [[str(c if c is not None else "") for c in r] for r in rows]
-    widths = _compute_widths(headers, raw_rows, max_col_width, term_width, padding)
-
-    # truncate only after measuring widths
-    trunc_rows = [[_truncate(v, widths[i]) for i, v in enumerate(r)] for r in raw_rows]
-
-    out = []
-    out.append(_draw_line(widths, top))
-    out.append(_draw_row(headers, widths, padding, vert))
-    out.append(_draw_line(widths, mid))
-    for r in trunc_rows:
-        out.append(_draw_row(r, widths, padding, vert))
-    out.append(_draw_line(widths, bot))
-    return "\n".join(out)
-
-def _print_table_from_dicts(dict_rows: List[Dict[str, Any]], headers: List[str], max_col_width: int, use_ascii: bool):
-    rows = [[row.get(h, "") for h in headers] for row in dict_rows]
-    print(_render_table(headers, rows, max_col_width=max_col_width, use_ascii=use_ascii))
-
-# ---------- Engine ----------
-SYSTEM_COLS_ORDER = ["id", "timestamp", "user", "active"]
-SYSTEM_COLS_TYPES: Dict[str, str] = {
-    "id": "int",
-    "timestamp": "int",  # Unix epoch (seconds)
-    "user": "text",
-    "active": "bool",
-}
-
-def _now_epoch() -> int:
-    return int(time.time())
-
-def _current_user() -> str:
-    return os.environ.get("SQL_USER") or getpass.getuser() or "unknown"
-
-class MiniEngine:
-    def __init__(self, data_dir: str = DATA_DIR_DEFAULT):
-        self.data_dir = data_dir
-        os.makedirs(self.data_dir, exist_ok=True)
-
-    # -------- Table ops --------
-    def create_table(self, table: str, colsdef_str: str):
-        # 1) parse user columns
-        user_schema: Dict[str, str] = {}
-        parts = [p for p in colsdef_str.split(",") if p.strip()]
-        for part in parts:
-            name_type = part.strip().split(":")
-            if len(name_type) != 2:
-                raise ValueError(f"Invalid column definition: {part}")
-            col = name_type[0].strip()
-            typ = name_type[1].strip().lower()
-            if typ in ("int", "integer"):
-                typ = "int"
-            elif typ in ("float", "real", "double"):
-                typ = "float"
-            elif typ in ("bool", "boolean"):
-                typ = "bool"
-            else:
-                typ = "text"
-            user_schema[col] = typ
-
-        # 2) enforce system columns at the start with correct types
-        schema: Dict[str, str] = {}
-        for c in SYSTEM_COLS_ORDER:
-            schema[c] = SYSTEM_COLS_TYPES[c]
-        # 3) add user columns (don’t overwrite system columns)
-        for col, typ in user_schema.items():
-            if col in SYSTEM_COLS_TYPES:
-                continue
-            schema[col] = typ
-
-        _save_json(_p(self.data_dir, table, "schema.json"), schema)
-        open(_p(self.data_dir, table, "ndjson"), "a", encoding="utf-8").close()
-
-    def show_schema(self, table: str) -> Dict[str, str]:
-        schema = _load_json(_p(self.data_dir, table, "schema.json"), None)
-        if schema is None:
-            raise ValueError(f"Table '{table}' does not exist.")
-        # Guarantee system columns (retrofit for existing tables)
-        changed = False
-        for c in SYSTEM_COLS_ORDER:
-            if c not in schema or schema[c] != SYSTEM_COLS_TYPES[c]:
-                schema[c] = SYSTEM_COLS_TYPES[c]
-                changed = True
-        # Restore system columns at the front
-        if changed or list(schema.keys())[:4] != SYSTEM_COLS_ORDER:
-            rest = [k for k in schema.keys() if k not in SYSTEM_COLS_TYPES]
-            new_schema = {c: SYSTEM_COLS_TYPES[c] for c in SYSTEM_COLS_ORDER}
-            for k in rest:
-                new_schema[k] = schema[k]
-            schema = new_schema
-            _save_json(_p(self.data_dir, table, "schema.json"), schema)
-        return schema
-
-    def list_tables(self) -> List[str]:
-        names = set()
-        for fn in os.listdir(self.data_dir):
-            if fn.endswith(".schema.json"):
-                names.add(fn[:-12])
-        return sorted(names)
-
-    # -------- Insert / upsert (append-only) --------
-    def insert(self, table: str, values_expr: str) -> Dict[str, Any]:
-        """
-        Accepts a subset of columns. If id is present, this acts as a new version for that id.
-        Example: "id=1, name='John'"
-        System columns are auto-filled: id (auto), timestamp (now), user (OS), active (true by default).
-        """
-        schema = self.show_schema(table)
-        kv = self._parse_kv_list(values_expr)
-        row_raw = {k: _parse_value(v) for k, v in kv.items()}
-
-        # auto-increment id if not provided
-        if "id" not in row_raw or row_raw["id"] is None or row_raw["id"] == "":
-            next_id = self._next_id(table)
-            row_raw["id"] = next_id
-
-        # defaults for system columns
-        row_raw.setdefault("timestamp", _now_epoch())
-        row_raw.setdefault("user", _current_user())
-        row_raw.setdefault("active", True)
-
-        # type coercion + fill missing columns with None
-        row: Dict[str, Any] = {}
-        for col, typ in schema.items():
-            if col in row_raw:
-                row[col] = _coerce_single_value(row_raw[col], typ)
-            else:
-                row[col] = None
-
-        ndjson = _p(self.data_dir, table, "ndjson")
-        with open(ndjson, "a", encoding="utf-8") as f:
-            f.write(json.dumps(row, ensure_ascii=False) + "\n")
-        line_nr = self._rowcount(ndjson) - 1
-        self._update_indexes_after_insert(table, row, line_nr)
-        return row
-
-    # -------- Deactivate (soft-delete) --------
-    def deactivate(self, table: str, id_value: Any) -> Dict[str, Any]:
-        schema = self.show_schema(table)
-        act_col = "active"
-        if act_col not in schema:
-            raise ValueError("Table is missing required column 'active'.")
-
-        row = {col: None for col in schema.keys()}
-        row["id"] = _coerce_single_value(id_value, schema["id"]) if "id" in schema else id_value
-        row[act_col] = False
-        # update system fields
-        row["timestamp"] = _now_epoch()
-        row["user"] = _current_user()
-
-        ndjson = _p(self.data_dir, table, "ndjson")
-        with open(ndjson, "a", encoding="utf-8") as f:
-            f.write(json.dumps(row, ensure_ascii=False) + "\n")
-        line_nr = self._rowcount(ndjson) - 1
-        self._update_indexes_after_insert(table, row, line_nr)
-        return row
-
-    # -------- Select with version collapse --------
-    def select(self, table: str, cols: List[str], where: Optional[str], history: bool=False) -> List[Dict[str, Any]]:
-        schema = self.show_schema(table)
-        ndjson = _p(self.data_dir, table, "ndjson")
-        if not os.path.exists(ndjson):
-            return []
-
-        filters = self._parse_where(where) if where else []
-
-        rows_with_line: List[Tuple[int, Dict[str, Any]]] = []
-        with open(ndjson, "r", encoding="utf-8") as f:
-            for i, line in enumerate(f):
-                if not line.strip():
-                    continue
-                r = json.loads(line)
-                rows_with_line.append((i, r))
-
-        if history:
-            out = []
-            for ln, r in rows_with_line:
-                if self._row_matches_filters(r, filters):
-                    out.append(self._project(r, cols))
-            return out
-
-        if "id" not in schema:
-            out = []
-            for ln, r in reversed(rows_with_line):
-                if self._row_matches_filters(r, filters):
-                    out.append(self._project(r, cols))
-            return list(reversed(out))
-
-        latest_per_id: Dict[Any, Tuple[int, Dict[str, Any]]] = {}
-        for ln, r in rows_with_line:
-            rid = r.get("id", None)
-            if rid is None:
-                continue
-            ridc = _coerce_single_value(rid, schema["id"]) if "id" in schema else rid
-            if ridc not in latest_per_id:
-                latest_per_id[ridc] = (ln, dict(r))
-            else:
-                _, base = latest_per_id[ridc]
-                merged = _merge_versions(base, r)
-                latest_per_id[ridc] = (ln, merged)
-
-        results = []
-        for ridc, (ln, rmerged) in latest_per_id.items():
-            if self._row_matches_filters(rmerged, filters):
-                results.append(self._project(rmerged, cols))
-        # Apply ORDER (set by CLI via eng._order_keys)
-        order = getattr(self, "_order_keys", [])
-        results = self._sort_rows(results, schema, order)
-        return results
-
-    # -------- Show history for a single id --------
-    def show_history(self, table: str, id_value: Any) -> List[Dict[str, Any]]:
-        schema = self.show_schema(table)
-        ndjson = _p(self.data_dir, table, "ndjson")
-        if not os.path.exists(ndjson):
-            return []
-        out = []
-        with open(ndjson, "r", encoding="utf-8") as f:
-            for i, line in enumerate(f):
-                if not line.strip():
-                    continue
-                r = json.loads(line)
-                if "id" in r:
-                    try:
-                        ridc = _coerce_single_value(r["id"], schema["id"])
-                    except Exception:
-                        ridc = r["id"]
-                    if ridc == _coerce_single_value(id_value, schema["id"]):
-                        out.append({"line": i, "row": r})
-        return out
-
-    # -------- Index ops --------
-    def create_index(self, table: str, column: str):
-        schema = self.show_schema(table)
-        if column not in schema:
-            raise ValueError(f"Column '{column}' does not exist in '{table}'.")
-        ndjson = _p(self.data_dir, table, "ndjson")
-        idx: Dict[str, List[int]] = {}
-        if os.path.exists(ndjson):
-            with open(ndjson, "r", encoding="utf-8") as f:
-                for i, line in enumerate(f):
-                    if not line.strip():
-                        continue
-                    row = json.loads(line)
-                    key = json.dumps(row.get(column, None), ensure_ascii=False)
-                    idx.setdefault(key, []).append(i)
-        _save_json(_p(self.data_dir, table, f"{column}.idx.json"), idx)
-
-    def drop_index(self, table: str, column: str):
-        path = _p(self.data_dir, table, f"{column}.idx.json")
-        if os.path.exists(path):
-            os.remove(path)
-
-    # -------- Helpers --------
-    def _parse_where(self, expr: str) -> List[Tuple[str, str, Any]]:
-        parts = re.split(r"(?i)\s+AND\s+", expr.strip()) if expr else []
-        filters = []
-        m_re = re.compile(r"^\s*(\w+)\s*(=|!=|<=|>=|<|>|LIKE|ILIKE)\s*(.+?)\s*$", re.I)
-        for p in parts:
-            m = m_re.match(p)
-            if not m:
-                raise ValueError(f"Invalid WHERE condition: {p}")
-            col, op, valraw = m.group(1), m.group(2), m.group(3)
-            filters.append((col, op, _parse_value(valraw)))
-        return filters
-
-    def _row_matches_filters(self, row: Dict[str, Any], filters: List[Tuple[str, str, Any]]) -> bool:
-        for col, op, val in filters:
-            lv = row.get(col, None)
-            if op == "=":
-                if lv != val: return False
-            elif op == "!=":
-                if lv == val: return False
-            elif op == "<":
-                if not (lv is not None and lv < val): return False
-            elif op == "<=":
-                if not (lv is not None and lv <= val): return False
-            elif op == ">":
-                if not (lv is not None and lv > val): return False
-            elif op == ">=":
-                if not (lv is not None and lv >= val): return False
-            elif op.upper() == "LIKE":
-                # convert % to regex wildcard
-                pattern = str(val).replace("%", ".*")
-                if lv is None or not re.match("^" + pattern + "$", str(lv)):
-                    return False
-            elif op.upper() == "ILIKE":
-                pattern = str(val).replace("%", ".*")
-                if lv is None or not re.match("^" + pattern + "$", str(lv), flags=re.IGNORECASE):
-                    return False
-        return True
-
-    def _parse_order(self, schema: Dict[str, str], order_expr: Optional[str]) -> List[Tuple[str, bool]]:
-        """
-        Parse 'column [ASC|DESC], column2 [ASC|DESC]' -> list [(column, asc_bool), ...]
-        Unknown columns raise an error.
-        """
-        if not order_expr or not order_expr.strip():
-            # default: if 'id' in schema, sort by id ASC, else no ordering
-            return [("id", True)] if "id" in schema else []
-
-        out: List[Tuple[str, bool]] = []
-        parts = [p.strip() for p in order_expr.split(",") if p.strip()]
-        for p in parts:
-            tokens = p.split()
-            col = tokens[0]
-            if col not in schema:
-                raise ValueError(f"ORDER BY: column '{col}' does not exist.")
-            if len(tokens) >= 2:
-                dirword = tokens[1].upper()
-                if dirword not in ("ASC", "DESC"):
-                    raise ValueError(f"ORDER BY: invalid direction in '{p}' (use ASC or DESC).")
-                asc = (dirword == "ASC")
-            else:
-                asc = True
-            out.append((col, asc))
-        return out
-
-    def _sort_rows(self, rows: List[Dict[str, Any]], schema: Dict[str, str], order: List[Tuple[str, bool]]) -> List[Dict[str, Any]]:
-        """
-        Sort list of dicts using schema types and order keys.
-        - text -> casefold() for stable case-insensitive sorting
-        - bool -> sort as int (False=0, True=1)
-        - None -> always smallest value (NULLS FIRST)
-        """
-        if not order:
-            return rows  # nothing to do
-
-        def key_for_col(col: str, typ: str):
-            def _k(v):
-                if v is None:
-                    if typ in ("int", "float", "bool"):
-                        return (0, 0)
-                    return (0, "")
-                if typ == "int":
-                    try:
-                        return (1, int(v))
-                    except Exception:
-                        return (1, str(v))
-                if typ == "float":
-                    try:
-                        return (1, float(v))
-                    except Exception:
-                        return (1, str(v))
-                if typ == "bool":
-                    try:
-                        return (1, 1 if bool(v) else 0)
-                    except Exception:
-                        return (1, 0)
-                # text/other
-                return (1, str(v).casefold())
-            return _k
-
-        # Python cannot mix asc/desc per key in a single sort call reliably:
-        # do stable sorts in reverse priority, one key at a time.
-        out = list(rows)
-        for col, asc in reversed(order):
-            typ = schema.get(col, "text")
-            kfunc = key_for_col(col, typ)
-            out.sort(key=lambda r: kfunc(r.get(col, None)), reverse=not asc)
-        return out
-
-    def _project(self, row: Dict[str, Any], cols: List[str]) -> Dict[str, Any]:
-        if cols == ["*"]:
-            return row
-        return {c: row.get(c, None) for c in cols}
-
-    def _parse_kv_list(self, s: str) -> Dict[str, str]:
-        items, cur, q, out = [], "", None, {}
-        for ch in s:
-            if q:
-                cur += ch
-                if ch == q:
-                    q = None
-            else:
-                if ch in ("'", '"'):
-                    q = ch
-                    cur += ch
-                elif ch == ",":
-                    if cur.strip():
-                        items.append(cur.strip())
-                    cur = ""
-                else:
-                    cur += ch
-        if cur.strip():
-            items.append(cur.strip())
-        for it in items:
-            if "=" not in it:
-                raise ValueError(f"Invalid key=value pair: {it}")
-            k, v = it.split("=", 1)
-            out[k.strip()] = v.strip()
-        return out
-
-    def _rowcount(self, ndjson_path: str) -> int:
-        c = 0
-        with open(ndjson_path, "r", encoding="utf-8") as f:
-            for _ in f:
-                c += 1
-        return c
-
-    def _has_index(self, table: str, column: str) -> bool:
-        return os.path.exists(_p(self.data_dir, table, f"{column}.idx.json"))
-
-    def _idx_lookup(self, table: str, column: str, value: Any) -> List[int]:
-        idx = _load_json(_p(self.data_dir, table, f"{column}.idx.json"), {})
-        key = json.dumps(value, ensure_ascii=False)
-        return idx.get(key, [])
-
-    def _update_indexes_after_insert(self, table: str, row: Dict[str, Any], line_nr: int):
-        for fn in os.listdir(self.data_dir):
-            if fn.startswith(f"{table}.") and fn.endswith(".idx.json"):
-                col = fn[len(table)+1:-9]
-                val = row.get(col, None)
-                key = json.dumps(val, ensure_ascii=False)
-                path = _p(self.data_dir, table, f"{col}.idx.json")
-                idx = _load_json(path, {})
-                idx.setdefault(key, []).append(line_nr)
-                _save_json(path, idx)
-
-    def _next_id(self, table: str) -> int:
-        """Find highest id in the table and return +1. If empty, start at 1."""
-        ndjson = _p(self.data_dir, table, "ndjson")
-        max_id = 0
-        if os.path.exists(ndjson):
-            with open(ndjson, "r", encoding="utf-8") as f:
-                for line in f:
-                    if not line.strip():
-                        continue
-                    try:
-                        r = json.loads(line)
-                        if "id" in r and r["id"] is not None:
-                            rid = int(r["id"])
-                            if rid > max_id:
-                                max_id = rid
-                    except Exception:
-                        continue
-        return max_id + 1
-
-# ============ CLI ============
-def main():
-    parser = argparse.ArgumentParser(description="Mini append-only SQL (versioned rows + soft-delete).")
-    parser.add_argument("--data-dir", default=DATA_DIR_DEFAULT, help="Directory for data files")
-    parser.add_argument("--pretty", action="store_true", help="Pretty-print JSON output")
-    # global output options
-    parser.add_argument("--output", choices=["json", "table"], default="json", help="Output format")
-    parser.add_argument("--ascii", action="store_true", help="ASCII borders in table")
-    parser.add_argument("--max-col-width", type=int, default=48, help="Max column width in table")
-    sub = parser.add_subparsers(dest="cmd", required=True)
-
-    p_ct = sub.add_parser("create-table", help="Create a table")
-    p_ct.add_argument("table")
-    p_ct.add_argument("--cols", required=True, help='E.g. "name:text, email:text" (system columns are auto-added)')
-
-    sub.add_parser("list-tables", help="List tables")
-
-    p_ss = sub.add_parser("show-schema", help="Show schema")
-    p_ss.add_argument("table")
-
-    p_ins = sub.add_parser("insert", help="Insert (or update) a row as a new version (append). id is optional (auto-increment).")
-    p_ins.add_argument("table")
-    p_ins.add_argument("--values", required=True, help='E.g. "name=\'John\', email=\'john@example.com\'" or "id=1, name=\'John\'"')
-    p_ins.add_argument("--user", help="Override user for this insert")
-
-    p_deact = sub.add_parser("deactivate", help="Soft-delete: append a version with active=false")
-    p_deact.add_argument("table")
-    p_deact.add_argument("id")
-    p_deact.add_argument("--user", help="Override user for this deactivate")
-
-    p_sel = sub.add_parser("select", help="Select (default: latest version per id)")
-    p_sel.add_argument("table")
-    p_sel.add_argument("--cols", default="*", help='"id,name" or "*"')
-    p_sel.add_argument("--where", default=None, help='E.g. "active = true AND id >= 1"')
-    p_sel.add_argument("--history", action="store_true", help="Show all versions (chronological)")
-    p_sel.add_argument("--order", default=None, help='ORDER BY, e.g.: "name ASC, timestamp DESC"')
-
-    p_hist = sub.add_parser("show-history", help="Show all versions for one id")
-    p_hist.add_argument("table")
-    p_hist.add_argument("id")
-
-    p_cix = sub.add_parser("create-index", help="Create index on column")
-    p_cix.add_argument("table"); p_cix.add_argument("column")
-    p_dix = sub.add_parser("drop-index", help="Drop index")
-    p_dix.add_argument("table"); p_dix.add_argument("column")
-
-    args = parser.parse_args()
-    eng = MiniEngine(args.data_dir)
-
-    def print_json(obj):
-        print(json.dumps(obj, ensure_ascii=False, indent=2 if args.pretty else None))
-
-    try:
-        if args.cmd == "create-table":
-            eng.create_table(args.table, args.cols)
-            print_json({"ok": True, "table": args.table})
-
-        elif args.cmd == "list-tables":
-            tables = eng.list_tables()
-            if args.output == "table":
-                rows = [{"table": t} for t in tables]
-                _print_table_from_dicts(rows, ["table"], args.max_col_width, args.ascii)
-            else:
-                print_json(tables)
-
-        elif args.cmd == "show-schema":
-            schema = eng.show_schema(args.table)
-            if args.output == "table":
-                rows = [{"column": k, "type": v} for k, v in schema.items()]
-                _print_table_from_dicts(rows, ["column", "type"], args.max_col_width, args.ascii)
-            else:
-                print_json(schema)
-
-        elif args.cmd == "insert":
-            if args.user:
-                os.environ["SQL_USER"] = args.user
-            row = eng.insert(args.table, args.values)
-            print_json({"ok": True, "inserted": row})
-
-        elif args.cmd == "deactivate":
-            if args.user:
-                os.environ["SQL_USER"] = args.user
-            row = eng.deactivate(args.table, _parse_value(args.id))
-            print_json({"ok": True, "deactivated": row})
-
-        elif args.cmd == "select":
-            cols = [c.strip() for c in args.cols.split(",")] if args.cols.strip() != "*" else ["*"]
-
-            # ORDER parsing + pass to engine
-            schema_for_order = eng.show_schema(args.table)
-            eng._order_keys = eng._parse_order(schema_for_order, args.order)
-
-            rows = eng.select(args.table, cols, args.where, history=args.history)
-            if args.output == "table":
-                # headers
-                if cols == ["*"]:
-                    schema = eng.show_schema(args.table)
-                    headers = list(schema.keys())
-                else:
-                    headers = cols
-                dict_rows = []
-                for r in rows:
-                    if cols == ["*"]:
-                        schema = eng.show_schema(args.table)
-                        dict_rows.append({k: r.get(k, "") for k in schema.keys()})
-                    else:
-                        dict_rows.append({k: r.get(k, "") for k in headers})
-                _print_table_from_dicts(dict_rows, headers, args.max_col_width, args.ascii)
-            else:
-                print_json(rows)
-
-        elif args.cmd == "show-history":
-            idval = _parse_value(args.id)
-            hist = eng.show_history(args.table, idval)
-            if args.output == "table":
-                schema = eng.show_schema(args.table)
-                headers = ["line"] + list(schema.keys())
-                dict_rows = []
-                for item in hist:
-                    row = {"line": item.get("line", "")}
-                    raw = item.get("row", {})
-                    for k in schema.keys():
-                        row[k] = raw.get(k, "")
-                    dict_rows.append(row)
-                _print_table_from_dicts(dict_rows, headers, args.max_col_width, args.ascii)
-            else:
-                print_json(hist)
-
-        elif args.cmd == "create-index":
-            eng.create_index(args.table, args.column)
-            print_json({"ok": True, "index": {"table": args.table, "column": args.column}})
-
-        elif args.cmd == "drop-index":
-            eng.drop_index(args.table, args.column)
-            print_json({"ok": True, "dropped": {"table": args.table, "column": args.column}})
-
-        else:
-            parser.error("Unknown subcommand.")
-
-    except Exception as e:
-        print(json.dumps({"ok": False, "error": str(e)}), file=sys.stderr)
-        sys.exit(1)
-
-if __name__ == "__main__":
-    main()
+#!/usr/bin/env python3
+import json, mmap, os, re, struct, sys, argparse, shutil, time, getpass
+from typing import Any, Dict, List, Tuple, Optional
+
+# Optional fast JSON codec for the NDJSON hot paths (per-line loads/dumps).
+# Schema files stay on stdlib json: they are tiny and written pretty rarely.
+try:
+    import orjson
+
+    _loads = orjson.loads
+
+    def _dumps_line(obj) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_APPEND_NEWLINE)
+except ImportError:
+    orjson = None
+
+    def _loads(data):
+        # stdlib json does not take memoryview slices
+        if isinstance(data, memoryview):
+            data = bytes(data)
+        return json.loads(data)
+
+    def _dumps_line(obj) -> bytes:
+        return (json.dumps(obj, ensure_ascii=False) + "\n").encode("utf-8")
+
+# Optional pandas for the vectorized select path on large scans.
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
+
+# Optional numba: JIT kernel for numeric WHERE filters in the row-loop path.
+try:
+    import numpy as np
+    from numba import njit
+except ImportError:
+    np = None
+    njit = None
+
+if njit is not None:
+    @njit(cache=True)
+    def _num_filter_mask(cols2d, ops, vals):
+        """
+        AND-combine numeric comparisons over a (filters x rows) float64
+        matrix. Missing/None values are NaN, which compares False for
+        =/</<=/>/>= and True for != — the same outcome as the None guards
+        in _row_matches_filters.
+        """
+        nf, n = cols2d.shape
+        mask = np.ones(n, np.bool_)
+        for j in range(nf):
+            op = ops[j]
+            v = vals[j]
+            for i in range(n):
+                if not mask[i]:
+                    continue
+                x = cols2d[j, i]
+                if op == 0:
+                    ok = x == v
+                elif op == 1:
+                    ok = x != v
+                elif op == 2:
+                    ok = x < v
+                elif op == 3:
+                    ok = x <= v
+                elif op == 4:
+                    ok = x > v
+                else:
+                    ok = x >= v
+                if not ok:
+                    mask[i] = False
+        return mask
+else:
+    _num_filter_mask = None
+
+_NUM_OP_CODES = {"=": 0, "!=": 1, "<": 2, "<=": 3, ">": 4, ">=": 5}
+
+# One comparator per op, bound into the filter at parse time so the row
+# loop is a plain call — no string compare / branch chain per row.
+_OP_FUNCS = {
+    "=": lambda a, b: a == b,
+    "!=": lambda a, b: a != b,
+    "<": lambda a, b: a is not None and a < b,
+    "<=": lambda a, b: a is not None and a <= b,
+    ">": lambda a, b: a is not None and a > b,
+    ">=": lambda a, b: a is not None and a >= b,
+    "contains": lambda a, b: a is not None and b in str(a),
+    "icontains": lambda a, b: a is not None and b in str(a).lower(),
+    "startswith": lambda a, b: a is not None and str(a).startswith(b),
+    "istartswith": lambda a, b: a is not None and str(a).lower().startswith(b),
+    "endswith": lambda a, b: a is not None and str(a).endswith(b),
+    "iendswith": lambda a, b: a is not None and str(a).lower().endswith(b),
+    "regex": lambda a, b: a is not None and b.match(str(a)) is not None,
+}
+
+# Optional pyarrow for the columnar compaction shadow (compact command).
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+# Scans at least this large take the vectorized path automatically
+# (when pandas is available); --vectorized forces it.
+VECTORIZE_MIN_ROWS = 1000
+
+# Optional SIMD JSON parser. A single reused Parser amortizes its internal
+# buffers across calls; each document is materialized with as_dict() before
+# the next parse reclaims the buffer.
+try:
+    import simdjson
+
+    _simd_parser = simdjson.Parser()
+except ImportError:
+    simdjson = None
+    _simd_parser = None
+
+DATA_DIR_DEFAULT = "data"
+
+# key = value tokenizer for insert --values; a value is any mix of quoted
+# spans and bare (comma/quote-free) text, matching the old char-loop rules.
+_KV_RE = re.compile(r"""(\w+)\s*=\s*((?:'[^']*'|"[^"]*"|[^,'"])*)""")
+
+# WHERE grammar: conditions joined by AND
+_AND_RE = re.compile(r"\s+AND\s+", re.I)
+_COND_RE = re.compile(r"^\s*(\w+)\s*(=|!=|<=|>=|<|>|LIKE|ILIKE)\s*(.+?)\s*$", re.I)
+
+def _iter_ndjson_bytes(buf, base_line: int = 0):
+    """
+    Yield (line_nr, slice) for every line of an NDJSON buffer (bytes or
+    mmap), splitting at the bytes layer: no TextIOWrapper, no per-line str
+    decode, and zero-copy memoryview slices for the parser. Blank lines
+    yield None so callers keep physical line numbering.
+    """
+    view = memoryview(buf)
+    n = len(view)
+    pos, i = 0, base_line
+    while pos < n:
+        nl = buf.find(b"\n", pos)
+        end = n if nl < 0 else nl
+        # rows start with '{'; anything else is checked the slow way
+        if end > pos and (view[pos] == 0x7B or bytes(view[pos:end]).strip()):
+            yield i, view[pos:end]
+        else:
+            yield i, None
+        pos = end + 1
+        i += 1
+
+# ---------- Path helpers ----------
+def _p(data_dir: str, table: str, ext: str) -> str:
+    return os.path.join(data_dir, f"{table}.{ext}")
+
+def _load_json(path: str, default):
+    if not os.path.exists(path):
+        return default
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def _save_json(path: str, obj):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(obj, f, ensure_ascii=False)
+
+# ---------- Parse & types ----------
+def _parse_value(s: str) -> Any:
+    s = s.strip()
+    if len(s) >= 2 and ((s[0] == "'" and s[-1] == "'") or (s[0] == '"' and s[-1] == '"')):
+        return s[1:-1]
+    if s.lower() in ("true", "false"):
+        return s.lower() == "true"
+    if s.lower() in ("null", "none"):
+        return None
+    try:
+        if "." in s:
+            return float(s)
+        return int(s)
+    except ValueError:
+        return s
+
+def _coerce_single_value(v: Any, typ: str) -> Any:
+    if v is None:
+        return None
+    if typ == "int":
+        return int(v)
+    if typ == "float":
+        return float(v)
+    if typ == "bool":
+        if isinstance(v, str):
+            return v.lower() == "true"
+        return bool(v)
+    return str(v)
+
+# ---------- Table renderer (pure Python) ----------
+def _truncate(s: str, width: int) -> str:
+    s = "" if s is None else str(s)
+    if width <= 3:
+        return s[:width]
+    return s if len(s) <= width else s[: width - 2] + "…"
+
+def _fit_widths(widths: List[int], max_col_width: int, term_width: Optional[int], padding: int = 1) -> List[int]:
+    """
+    Cap widths at max_col_width, then shrink proportionally (never below 8)
+    so the table fits the terminal. One pass over the columns, instead of
+    taking one character per column per iteration.
+    """
+    widths = [min(w, max_col_width) for w in widths]
+    total = 1
+    for w in widths:
+        total += padding + w + padding + 1
+    if not term_width or total <= term_width:
+        return widths
+    shrinkable = [max(0, w - 8) for w in widths]
+    budget = sum(shrinkable)
+    if budget == 0:
+        return widths
+    overflow = min(total - term_width, budget)
+    cut = [overflow * s // budget for s in shrinkable]
+    # distribute the rounding remainder to columns that still have slack
+    remaining = overflow - sum(cut)
+    for i in sorted(range(len(widths)), key=lambda i: shrinkable[i] - cut[i], reverse=True):
+        if remaining <= 0:
+            break
+        take = min(remaining, shrinkable[i] - cut[i])
+        cut[i] += take
+        remaining -= take
+    return [w - c for w, c in zip(widths, cut)]
+
+def _draw_line(widths: List[int], chars: Tuple[str, str, str, str, str]) -> str:
+    left, mid, cross, right, fill = chars
+    parts = [left]
+    for i, w in enumerate(widths):
+        parts.append(fill * (w + 2))
+        parts.append(cross if i < len(widths) - 1 else right)
+    return "".join(parts)
+
+def _draw_row(values: List[str], widths: List[int], padding: int, vert: str) -> str:
+    out = [vert]
+    for i, v in enumerate(values):
+        cell = " " * padding + v.ljust(widths[i]) + " " * padding
+        out.append(cell)
+        out.append(vert)
+    return "".join(out)
+
+def _render_table(headers: List[str], rows: List[List[str]], max_col_width: int = 48, use_ascii: bool = False) -> str:
+    if use_ascii:
+        top = ("+", "+", "+", "+", "-")
+        mid = ("+", "+", "+", "+", "-")
+        bot = ("+", "+", "+", "+", "-")
+        vert = "|"
+    else:
+        top = ("┌", "┬", "┬", "┐", "─")
+        mid = ("├", "┼", "┼", "┤", "─")
+        bot = ("└", "┴", "┴", "┘", "─")
+        vert = "│"
+
+    try:
+        term_width = shutil.get_terminal_size().columns
+    except Exception:
+        term_width = None
+
+    padding = 1
+    # one pass: stringify cells and track per-column max width as we go
+    widths = [len(h) for h in headers]
+    raw_rows: List[List[str]] = []
+    for r in rows:
+        vals = []
+        for i, c in enumerate(r):
+            v = str(c if c is not None else "")
+            vals.append(v)
+            if len(v) > widths[i]:
+                widths[i] = len(v)
+        raw_rows.append(vals)
+    widths = _fit_widths(widths, max_col_width, term_width, padding)
+
+    # truncate only after measuring widths
+    trunc_rows = [[_truncate(v, widths[i]) for i, v in enumerate(r)] for r in raw_rows]
+
+    out = []
+    out.append(_draw_line(widths, top))
+    out.append(_draw_row(headers, widths, padding, vert))
+    out.append(_draw_line(widths, mid))
+    for r in trunc_rows:
+        out.append(_draw_row(r, widths, padding, vert))
+    out.append(_draw_line(widths, bot))
+    return "\n".join(out)
+
+def _print_table_from_dicts(dict_rows: List[Dict[str, Any]], headers: List[str], max_col_width: int, use_ascii: bool):
+    rows = [[row.get(h, "") for h in headers] for row in dict_rows]
+    print(_render_table(headers, rows, max_col_width=max_col_width, use_ascii=use_ascii))
+
+# ---------- Engine ----------
+SYSTEM_COLS_ORDER = ["id", "timestamp", "user", "active"]
+SYSTEM_COLS_TYPES: Dict[str, str] = {
+    "id": "int",
+    "timestamp": "int",  # Unix epoch (seconds)
+    "user": "text",
+    "active": "bool",
+}
+
+def _now_epoch() -> int:
+    return int(time.time())
+
+def _current_user() -> str:
+    return os.environ.get("SQL_USER") or getpass.getuser() or "unknown"
+
+class MiniEngine:
+    def __init__(self, data_dir: str = DATA_DIR_DEFAULT):
+        self.data_dir = data_dir
+        os.makedirs(self.data_dir, exist_ok=True)
+        # In-process caches, validated with a cheap stat per call.
+        # Schema: mtime -> parsed dict. Rows: (mtime, size, line count) -> parsed
+        # rows; since tables are append-only, a grown file only needs its tail parsed.
+        self._schema_cache: Dict[str, Tuple[float, Dict[str, str]]] = {}
+        self._rows_cache: Dict[str, Tuple[float, int, int, List[Tuple[int, Dict[str, Any]]]]] = {}
+        # Indexed columns per table (one directory scan on first access) and
+        # folded index dicts keyed on (base snapshot mtime, append-log size).
+        self._indexes: Dict[str, List[str]] = {}
+        self._idx_cache: Dict[Tuple[str, str], Tuple[float, int, Dict[str, List[int]]]] = {}
+        # Per-line byte offsets (<table>.offsets.bin), keyed on NDJSON size.
+        self._offsets_cache: Dict[str, Tuple[int, List[int]]] = {}
+        # NDJSON line counts, seeded from the offsets file and bumped per append.
+        self._line_counts: Dict[str, int] = {}
+
+    # -------- Table ops --------
+    def create_table(self, table: str, colsdef_str: str):
+        # 1) parse user columns
+        user_schema: Dict[str, str] = {}
+        parts = [p for p in colsdef_str.split(",") if p.strip()]
+        for part in parts:
+            name_type = part.strip().split(":")
+            if len(name_type) != 2:
+                raise ValueError(f"Invalid column definition: {part}")
+            col = name_type[0].strip()
+            typ = name_type[1].strip().lower()
+            if typ in ("int", "integer"):
+                typ = "int"
+            elif typ in ("float", "real", "double"):
+                typ = "float"
+            elif typ in ("bool", "boolean"):
+                typ = "bool"
+            else:
+                typ = "text"
+            user_schema[col] = typ
+
+        # 2) enforce system columns at the start with correct types
+        schema: Dict[str, str] = {}
+        for c in SYSTEM_COLS_ORDER:
+            schema[c] = SYSTEM_COLS_TYPES[c]
+        # 3) add user columns (don’t overwrite system columns)
+        for col, typ in user_schema.items():
+            if col in SYSTEM_COLS_TYPES:
+                continue
+            schema[col] = typ
+
+        _save_json(_p(self.data_dir, table, "schema.json"), schema)
+        open(_p(self.data_dir, table, "ndjson"), "a", encoding="utf-8").close()
+        open(_p(self.data_dir, table, "offsets.bin"), "ab").close()
+        self._save_counter(table, 1)
+        self._schema_cache.pop(table, None)
+        self._rows_cache.pop(table, None)
+        self._line_counts.pop(table, None)
+
+    def show_schema(self, table: str) -> Dict[str, str]:
+        path = _p(self.data_dir, table, "schema.json")
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            raise ValueError(f"Table '{table}' does not exist.")
+        cached = self._schema_cache.get(table)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        schema = _load_json(path, None)
+        if schema is None:
+            raise ValueError(f"Table '{table}' does not exist.")
+        # Guarantee system columns (retrofit for existing tables)
+        changed = False
+        for c in SYSTEM_COLS_ORDER:
+            if c not in schema or schema[c] != SYSTEM_COLS_TYPES[c]:
+                schema[c] = SYSTEM_COLS_TYPES[c]
+                changed = True
+        # Restore system columns at the front
+        if changed or list(schema.keys())[:4] != SYSTEM_COLS_ORDER:
+            rest = [k for k in schema.keys() if k not in SYSTEM_COLS_TYPES]
+            new_schema = {c: SYSTEM_COLS_TYPES[c] for c in SYSTEM_COLS_ORDER}
+            for k in rest:
+                new_schema[k] = schema[k]
+            schema = new_schema
+            _save_json(path, schema)
+            mtime = os.stat(path).st_mtime
+        self._schema_cache[table] = (mtime, schema)
+        return schema
+
+    def list_tables(self) -> List[str]:
+        with os.scandir(self.data_dir) as it:
+            names = {e.name[:-12] for e in it if e.name.endswith(".schema.json")}
+        return sorted(names)
+
+    # -------- Insert / upsert (append-only) --------
+    def insert(self, table: str, values_expr: str) -> Dict[str, Any]:
+        """
+        Accepts a subset of columns. If id is present, this acts as a new version for that id.
+        Example: "id=1, name='John'"
+        System columns are auto-filled: id (auto), timestamp (now), user (OS), active (true by default).
+        """
+        schema = self.show_schema(table)
+        row, auto_id = self._build_row(schema, values_expr, lambda: self._next_id(table))
+
+        ndjson = _p(self.data_dir, table, "ndjson")
+        line_nr = self._line_count(table)
+        with open(ndjson, "ab") as f:
+            offset = f.tell()
+            f.write(_dumps_line(row))
+        self._line_counts[table] = line_nr + 1
+        self._append_offset(table, offset, line_nr)
+        self._update_indexes_after_insert(table, row, line_nr)
+        # keep the counter ahead of explicitly supplied ids
+        if not auto_id and isinstance(row.get("id"), int):
+            self._bump_counter(table, row["id"] + 1)
+        return row
+
+    def _build_row(self, schema: Dict[str, str], values_expr: str, alloc_id) -> Tuple[Dict[str, Any], bool]:
+        """
+        Parse a values expression into a typed row: auto id via alloc_id()
+        when none is given, system-column defaults, type coercion, and
+        missing columns filled with None. Returns (row, id_was_auto).
+        """
+        kv = self._parse_kv_list(values_expr)
+        row_raw = {k: _parse_value(v) for k, v in kv.items()}
+
+        # auto-increment id if not provided
+        auto_id = "id" not in row_raw or row_raw["id"] is None or row_raw["id"] == ""
+        if auto_id:
+            row_raw["id"] = alloc_id()
+
+        # defaults for system columns
+        row_raw.setdefault("timestamp", _now_epoch())
+        row_raw.setdefault("user", _current_user())
+        row_raw.setdefault("active", True)
+
+        # type coercion + fill missing columns with None
+        row: Dict[str, Any] = {}
+        for col, typ in schema.items():
+            if col in row_raw:
+                row[col] = _coerce_single_value(row_raw[col], typ)
+            else:
+                row[col] = None
+        return row, auto_id
+
+    def insert_many(self, table: str, values_exprs: List[str]) -> List[Dict[str, Any]]:
+        """
+        Batched insert: one file open, one counter write, one append per
+        index log, one offsets append, and a single fsync for the whole
+        batch — instead of paying each of those per row. Line numbers come
+        from the offsets sidecar, so no per-row rowcount scan either.
+        """
+        schema = self.show_schema(table)
+        counter = _load_json(self._counter_path(table), None)
+        next_id = int(counter.get("next_id", 1)) if counter else self._scan_max_id(table) + 1
+        line_nr = self._line_count(table)
+        first_line = line_nr
+        idx_logs: Dict[str, bytearray] = {col: bytearray() for col in self._indexed_columns(table)}
+        offsets: List[int] = []
+
+        def alloc():
+            nonlocal next_id
+            nid = next_id
+            next_id += 1
+            return nid
+
+        # Build (and thereby validate) every row before touching the file,
+        # so a malformed expression mid-batch appends nothing.
+        rows: List[Dict[str, Any]] = []
+        for expr in values_exprs:
+            row, auto_id = self._build_row(schema, expr, alloc)
+            if not auto_id and isinstance(row.get("id"), int):
+                next_id = max(next_id, row["id"] + 1)
+            rows.append(row)
+        # Reserve the id range before appending, like single insert does:
+        # rows orphaned by a failed append then hold ids no later insert
+        # will reuse as a phantom version.
+        self._save_counter(table, next_id)
+
+        ndjson = _p(self.data_dir, table, "ndjson")
+        with open(ndjson, "ab") as f:
+            for row in rows:
+                offsets.append(f.tell())
+                f.write(_dumps_line(row))
+                for col, buf in idx_logs.items():
+                    key = json.dumps(row.get(col, None), ensure_ascii=False)
+                    buf += _dumps_line({"k": key, "l": line_nr})
+                line_nr += 1
+            f.flush()
+            os.fsync(f.fileno())
+        self._line_counts[table] = line_nr
+
+        off_path = self._offsets_path(table)
+        try:
+            if os.stat(off_path).st_size // 8 == first_line:
+                with open(off_path, "ab") as f:
+                    f.write(struct.pack(f"<{len(offsets)}Q", *offsets))
+        except OSError:
+            pass  # legacy table: offsets are built lazily on read
+        self._offsets_cache.pop(table, None)
+        for col, buf in idx_logs.items():
+            if buf:
+                with open(_p(self.data_dir, table, f"{col}.idx.ndjson"), "ab") as f:
+                    f.write(bytes(buf))
+        return rows
+
+    # -------- Deactivate (soft-delete) --------
+    def deactivate(self, table: str, id_value: Any) -> Dict[str, Any]:
+        schema = self.show_schema(table)
+        act_col = "active"
+        if act_col not in schema:
+            raise ValueError("Table is missing required column 'active'.")
+
+        row = {col: None for col in schema.keys()}
+        row["id"] = _coerce_single_value(id_value, schema["id"]) if "id" in schema else id_value
+        row[act_col] = False
+        # update system fields
+        row["timestamp"] = _now_epoch()
+        row["user"] = _current_user()
+
+        ndjson = _p(self.data_dir, table, "ndjson")
+        line_nr = self._line_count(table)
+        with open(ndjson, "ab") as f:
+            offset = f.tell()
+            f.write(_dumps_line(row))
+        self._line_counts[table] = line_nr + 1
+        self._append_offset(table, offset, line_nr)
+        self._update_indexes_after_insert(table, row, line_nr)
+        # keep the counter ahead of explicitly supplied ids, as insert does:
+        # the old max-scan saw deactivation rows too
+        if isinstance(row.get("id"), int):
+            self._bump_counter(table, row["id"] + 1)
+        return row
+
+    # -------- Select with version collapse --------
+    def select(self, table: str, cols: List[str], where: Optional[str], history: bool=False) -> List[Dict[str, Any]]:
+        schema = self.show_schema(table)
+        filters = self._parse_where(where) if where else []
+
+        if filters:
+            via_index = self._select_via_index(table, schema, cols, filters, history)
+            if via_index is not None:
+                return via_index
+
+        rows_with_line = self._read_rows(table)
+
+        if (
+            not history
+            and "id" in schema
+            and pd is not None
+            and (getattr(self, "_vectorized", False) or len(rows_with_line) >= VECTORIZE_MIN_ROWS)
+        ):
+            # Vectorized path handles the common filters; anything it cannot
+            # express (LIKE variants, ordering on text) drops to the row loop.
+            try:
+                results = self._select_vectorized(schema, rows_with_line, filters, cols)
+            except Exception:
+                results = None
+            if results is not None:
+                order = getattr(self, "_order_keys", [])
+                return self._sort_rows(results, schema, order)
+
+        if history or "id" not in schema:
+            kept = self._filter_rows([r for _, r in rows_with_line], schema, filters)
+            return [self._project(r, cols) for r in kept]
+
+        merged = self._collapse_versions(rows_with_line, schema)
+        results = [self._project(r, cols) for r in self._filter_rows(merged, schema, filters)]
+        # Apply ORDER (set by CLI via eng._order_keys)
+        order = getattr(self, "_order_keys", [])
+        results = self._sort_rows(results, schema, order)
+        return results
+
+    def _collapse_versions(self, rows_with_line: List[Tuple[int, Dict[str, Any]]],
+                           schema: Dict[str, str]) -> List[Dict[str, Any]]:
+        """
+        Collapse versions to the latest row per id in one chronological
+        pass, in place: the accumulator dict is owned by the result, so
+        newer non-None values just overwrite it (None means "no change"),
+        with no per-version copies. Ids are coerced once per distinct raw
+        value, not once per row. Rows without an id are skipped.
+        """
+        latest_per_id: Dict[Any, Dict[str, Any]] = {}
+        id_typ = schema.get("id")
+        id_keys: Dict[Any, Any] = {}
+        for ln, r in rows_with_line:
+            rid = r.get("id", None)
+            if rid is None:
+                continue
+            ridc = id_keys.get(rid)
+            if ridc is None:
+                ridc = _coerce_single_value(rid, id_typ) if id_typ is not None else rid
+                id_keys[rid] = ridc
+            base = latest_per_id.get(ridc)
+            if base is None:
+                latest_per_id[ridc] = dict(r)
+            else:
+                for k, v in r.items():
+                    if v is not None:
+                        base[k] = v
+        return list(latest_per_id.values())
+
+    def _select_via_index(self, table: str, schema: Dict[str, str], cols: List[str],
+                          filters: List[Tuple[str, str, Any, Any]], history: bool) -> Optional[List[Dict[str, Any]]]:
+        """
+        Predicate pushdown: when equality filters hit indexed columns, read
+        only the posting-list lines instead of scanning the whole table.
+        Returns None when no index applies; the caller falls back to the
+        full scan.
+        """
+        eq = []
+        for c, op, v, _fn in filters:
+            if op != "=" or not self._has_index(table, c):
+                continue
+            # Index keys hold coerced column values, but the row path compares
+            # with Python == (cross-type: 3 == 3.0, 1 == True). Probe with the
+            # coerced value when it is ==-equal to the parsed one; otherwise
+            # the index cannot answer faithfully, so take the full scan.
+            typ = schema.get(c)
+            if typ is not None:
+                try:
+                    cv = _coerce_single_value(v, typ)
+                except (TypeError, ValueError):
+                    return None
+                if cv != v:
+                    return None
+                v = cv
+            eq.append((c, v))
+        if not eq:
+            return None
+        collapse = not history and "id" in schema
+        if collapse and not self._has_index(table, "id"):
+            # collapsing needs every version of each candidate id, which
+            # only the id index can provide without a full scan
+            return None
+        postings = sorted((self._idx_lookup(table, c, v) for c, v in eq), key=len)
+        candidate = set(postings[0])
+        for p in postings[1:]:
+            if not candidate:
+                break
+            candidate &= set(p)
+        rows = self._read_lines(table, candidate)
+        if not collapse:
+            kept = self._filter_rows([r for _, r in rows], schema, filters)
+            return [self._project(r, cols) for r in kept]
+        # pull in all versions of the candidate ids, then collapse and
+        # re-apply the full filter list against the merged rows
+        id_lines: set = set()
+        for rid in {r.get("id") for _, r in rows if r.get("id") is not None}:
+            id_lines.update(self._idx_lookup(table, "id", rid))
+        merged = self._collapse_versions(self._read_lines(table, id_lines), schema)
+        results = [self._project(r, cols) for r in self._filter_rows(merged, schema, filters)]
+        return self._sort_rows(results, schema, getattr(self, "_order_keys", []))
+
+    def _select_vectorized(self, schema: Dict[str, str], rows_with_line: List[Tuple[int, Dict[str, Any]]],
+                           filters: List[Tuple[str, str, Any, Any]], cols: List[str]) -> List[Dict[str, Any]]:
+        """
+        Columnar version of the select hot path: version collapse via
+        groupby.last (last non-null per column, matching _merge_versions)
+        and WHERE as vectorized boolean masks. Raises for filters it cannot
+        express; the caller falls back to the row loop.
+        """
+        df = pd.DataFrame([r for _, r in rows_with_line])
+        if "id" not in df.columns:
+            raise ValueError("no id column")
+        df = df[df["id"].notna()]
+        # group on the coerced id (so 1 and "1" collapse together, like the
+        # row loop) but keep the raw column values in the output
+        key = pd.to_numeric(df["id"]) if schema.get("id") in ("int", "float") else df["id"]
+        df = df.groupby(key, sort=False, as_index=False).last()
+
+        mask = pd.Series(True, index=df.index)
+        for col, op, val, _fn in filters:
+            s = df[col] if col in df.columns else pd.Series([None] * len(df), index=df.index, dtype=object)
+            if op in ("<", "<=", ">", ">="):
+                if schema.get(col, "text") not in ("int", "float", "bool"):
+                    raise TypeError(f"unsupported ordering on '{col}'")
+                s = pd.to_numeric(s, errors="coerce")  # NaN compares False, like the None guard
+                if op == "<":
+                    m = s < val
+                elif op == "<=":
+                    m = s <= val
+                elif op == ">":
+                    m = s > val
+                else:
+                    m = s >= val
+            elif op == "=":
+                # None == None passes in the row path; NA == val never does
+                m = s.isna() if val is None else s == val
+            elif op == "!=":
+                m = ~s.isna() if val is None else s != val
+            else:
+                raise TypeError(f"unsupported op '{op}'")
+            mask &= m
+        df = df[mask]
+        # back to plain Python scalars (and NaN -> None) for projection/output
+        df = df.astype(object).where(df.notna(), None)
+        records = df.to_dict("records")
+        # a null anywhere in an int column upcasts it to float; undo that so
+        # output matches the row loop (80, not 80.0)
+        int_cols = [c for c, t in schema.items() if t == "int" and c in df.columns]
+        for r in records:
+            for c in int_cols:
+                v = r[c]
+                if isinstance(v, float) and v.is_integer():
+                    r[c] = int(v)
+        return [self._project(r, cols) for r in records]
+
+    # -------- Show history for a single id --------
+    def show_history(self, table: str, id_value: Any) -> List[Dict[str, Any]]:
+        schema = self.show_schema(table)
+        out = []
+        for i, r in self._read_rows(table):
+            if "id" in r:
+                try:
+                    ridc = _coerce_single_value(r["id"], schema["id"])
+                except Exception:
+                    ridc = r["id"]
+                if ridc == _coerce_single_value(id_value, schema["id"]):
+                    out.append({"line": i, "row": r})
+        return out
+
+    # -------- Index ops --------
+    def create_index(self, table: str, column: str):
+        schema = self.show_schema(table)
+        if column not in schema:
+            raise ValueError(f"Column '{column}' does not exist in '{table}'.")
+        idx: Dict[str, List[int]] = {}
+        for i, row in self._read_rows(table):
+            key = json.dumps(row.get(column, None), ensure_ascii=False)
+            idx.setdefault(key, []).append(i)
+        # base snapshot + empty append log; inserts only ever append to the log
+        _save_json(_p(self.data_dir, table, f"{column}.idx.json"), idx)
+        open(_p(self.data_dir, table, f"{column}.idx.ndjson"), "wb").close()
+        self._indexes.pop(table, None)
+        self._idx_cache.pop((table, column), None)
+
+    def drop_index(self, table: str, column: str):
+        for ext in (f"{column}.idx.json", f"{column}.idx.ndjson"):
+            path = _p(self.data_dir, table, ext)
+            if os.path.exists(path):
+                os.remove(path)
+        self._indexes.pop(table, None)
+        self._idx_cache.pop((table, column), None)
+
+    # -------- Compaction (columnar shadow) --------
+    def compact(self, table: str):
+        """
+        Roll the rows parsed so far into <table>.parquet plus a watermark
+        (<table>.compact.json). The NDJSON keeps the full append-only
+        history; reads load the parquet shadow and JSON-parse only the
+        lines appended since the last compaction.
+        """
+        if pa is None:
+            raise ValueError("pyarrow is required for compact.")
+        self.show_schema(table)  # raises if the table does not exist
+        rows_with_line = self._read_rows(table)
+        cached = self._rows_cache.get(table)
+        if cached is None:
+            # _read_rows leaves the cache empty when the NDJSON is missing
+            raise ValueError(f"Table '{table}' has no data file to compact.")
+        size, nlines = cached[1], cached[2]
+        # types are inferred from the parsed values (int64/float64/bool/string
+        # for clean tables); write_table dictionary-encodes text by default
+        tbl = pa.Table.from_pylist([dict(r, _line=i) for i, r in rows_with_line])
+        pq_path = _p(self.data_dir, table, "parquet")
+        tmp = pq_path + ".tmp"
+        pq.write_table(tbl, tmp)
+        os.replace(tmp, pq_path)
+        _save_json(_p(self.data_dir, table, "compact.json"), {"size": size, "lines": nlines})
+        return {"rows": len(rows_with_line), "lines": nlines}
+
+    def _load_compacted(self, table: str) -> Optional[Tuple[int, int, List[Tuple[int, Dict[str, Any]]]]]:
+        """Load the parquet shadow if present: (byte watermark, line count, rows)."""
+        if pq is None:
+            return None
+        meta = _load_json(_p(self.data_dir, table, "compact.json"), None)
+        pq_path = _p(self.data_dir, table, "parquet")
+        if not meta or not os.path.exists(pq_path):
+            return None
+        try:
+            records = pq.read_table(pq_path).to_pylist()
+        except Exception:
+            return None
+        rows = [(r.pop("_line"), r) for r in records]
+        return (int(meta["size"]), int(meta["lines"]), rows)
+
+    # -------- Helpers --------
+    def _parse_where(self, expr: str) -> List[Tuple[str, str, Any, Any]]:
+        """Parse WHERE into (col, op, value, comparator) tuples."""
+        parts = _AND_RE.split(expr.strip()) if expr else []
+        filters = []
+        for p in parts:
+            m = _COND_RE.match(p)
+            if not m:
+                raise ValueError(f"Invalid WHERE condition: {p}")
+            col, op, valraw = m.group(1), m.group(2), m.group(3)
+            if op.upper() in ("LIKE", "ILIKE"):
+                op, val = self._compile_like(str(_parse_value(valraw)), op.upper() == "ILIKE")
+            else:
+                val = _parse_value(valraw)
+            filters.append((col, op, val, _OP_FUNCS[op]))
+        return filters
+
+    def _compile_like(self, pattern: str, ci: bool) -> Tuple[str, Any]:
+        """
+        Compile a LIKE/ILIKE pattern once, outside the row loop.
+        Anchored '%x%' / 'x%' / '%x' patterns with a literal needle become
+        plain substring/prefix/suffix checks; anything else becomes one
+        pre-compiled regex (% -> .*, matching the old per-row behavior).
+        """
+        def literal(s: str) -> bool:
+            return "%" not in s and re.escape(s) == s
+
+        if len(pattern) >= 2 and pattern.startswith("%") and pattern.endswith("%") and literal(pattern[1:-1]):
+            needle = pattern[1:-1]
+            return ("icontains", needle.lower()) if ci else ("contains", needle)
+        if pattern.endswith("%") and literal(pattern[:-1]):
+            needle = pattern[:-1]
+            return ("istartswith", needle.lower()) if ci else ("startswith", needle)
+        if pattern.startswith("%") and literal(pattern[1:]):
+            needle = pattern[1:]
+            return ("iendswith", needle.lower()) if ci else ("endswith", needle)
+        flags = re.IGNORECASE if ci else 0
+        return ("regex", re.compile("^" + pattern.replace("%", ".*") + "$", flags))
+
+    def _filter_rows(self, rows: List[Dict[str, Any]], schema: Dict[str, str],
+                     filters: List[Tuple[str, str, Any, Any]]) -> List[Dict[str, Any]]:
+        """
+        Apply WHERE filters to a list of rows. On large scans with numba
+        installed, numeric comparisons are batched through the JIT kernel
+        (typed float64 columns, NaN for missing); text/LIKE filters stay in
+        Python and are ANDed on the surviving rows.
+        """
+        if not filters or not rows:
+            return rows
+        if _num_filter_mask is not None and len(rows) >= VECTORIZE_MIN_ROWS:
+            numeric, rest = [], []
+            for f in filters:
+                col, op, val, _fn = f
+                if (op in _NUM_OP_CODES and schema.get(col) in ("int", "float", "bool")
+                        and isinstance(val, (int, float))):
+                    numeric.append(f)
+                else:
+                    rest.append(f)
+            if numeric:
+                n = len(rows)
+                cols2d = np.empty((len(numeric), n), np.float64)
+                for j, (col, _op, _val, _fn) in enumerate(numeric):
+                    cols2d[j, :] = np.fromiter(
+                        (float(v) if isinstance(v, (int, float)) else np.nan
+                         for v in (r.get(col) for r in rows)),
+                        np.float64, n)
+                ops = np.array([_NUM_OP_CODES[op] for _col, op, _val, _fn in numeric], np.int64)
+                vals = np.array([float(val) for _col, _op, val, _fn in numeric], np.float64)
+                mask = _num_filter_mask(cols2d, ops, vals)
+                return [r for r, keep in zip(rows, mask) if keep and self._row_matches_filters(r, rest)]
+        return [r for r in rows if self._row_matches_filters(r, filters)]
+
+    def _row_matches_filters(self, row: Dict[str, Any], filters: List[Tuple[str, str, Any, Any]]) -> bool:
+        return all(fn(row.get(col, None), val) for col, _op, val, fn in filters)
+
+    def _parse_order(self, schema: Dict[str, str], order_expr: Optional[str]) -> List[Tuple[str, bool]]:
+        """
+        Parse 'column [ASC|DESC], column2 [ASC|DESC]' -> list [(column, asc_bool), ...]
+        Unknown columns raise an error.
+        """
+        if not order_expr or not order_expr.strip():
+            # default: if 'id' in schema, sort by id ASC, else no ordering
+            return [("id", True)] if "id" in schema else []
+
+        out: List[Tuple[str, bool]] = []
+        parts = [p.strip() for p in order_expr.split(",") if p.strip()]
+        for p in parts:
+            tokens = p.split()
+            col = tokens[0]
+            if col not in schema:
+                raise ValueError(f"ORDER BY: column '{col}' does not exist.")
+            if len(tokens) >= 2:
+                dirword = tokens[1].upper()
+                if dirword not in ("ASC", "DESC"):
+                    raise ValueError(f"ORDER BY: invalid direction in '{p}' (use ASC or DESC).")
+                asc = (dirword == "ASC")
+            else:
+                asc = True
+            out.append((col, asc))
+        return out
+
+    @staticmethod
+    def _key_for_type(typ: str):
+        """
+        Normalizer mapping a raw value to an orderable (present, value) key:
+        None sorts first, text casefolds, bool counts as int, and numerics
+        fall back to their string form. The type branch is resolved here,
+        once per order key, not per element.
+        """
+        if typ == "int":
+            def _k(v):
+                if v is None:
+                    return (0, 0)
+                try:
+                    return (1, int(v))
+                except Exception:
+                    return (1, str(v))
+        elif typ == "float":
+            def _k(v):
+                if v is None:
+                    return (0, 0)
+                try:
+                    return (1, float(v))
+                except Exception:
+                    return (1, str(v))
+        elif typ == "bool":
+            def _k(v):
+                if v is None:
+                    return (0, 0)
+                try:
+                    return (1, 1 if bool(v) else 0)
+                except Exception:
+                    return (1, 0)
+        else:
+            def _k(v):
+                if v is None:
+                    return (0, "")
+                return (1, str(v).casefold())
+        return _k
+
+    def _sort_rows(self, rows: List[Dict[str, Any]], schema: Dict[str, str], order: List[Tuple[str, bool]]) -> List[Dict[str, Any]]:
+        """
+        Sort list of dicts using schema types and order keys.
+        - text -> casefold() for stable case-insensitive sorting
+        - bool -> sort as int (False=0, True=1)
+        - None -> always smallest value (NULLS FIRST)
+        All-ascending orders (including the default ORDER BY id) sort once
+        with a composite key; descending numeric keys are negated instead
+        of reverse-sorted; only descending text needs the multi-pass.
+        """
+        if not order:
+            return rows  # nothing to do
+
+        pairs = [(col, asc, self._key_for_type(schema.get(col, "text"))) for col, asc in order]
+
+        if all(asc for _col, asc, _kf in pairs):
+            return sorted(rows, key=lambda r: tuple(kf(r.get(col, None)) for col, _asc, kf in pairs))
+
+        if all(asc or schema.get(col, "text") in ("int", "float", "bool") for col, asc, _kf in pairs):
+            def composite(r):
+                key = []
+                for col, asc, kf in pairs:
+                    present, v = kf(r.get(col, None))
+                    key.append((present, v) if asc else (-present, -v))
+                return tuple(key)
+            try:
+                return sorted(rows, key=composite)
+            except TypeError:
+                pass  # stray text in a numeric column: take the stable path
+
+        # Mixed directions with text keys: stable sorts in reverse priority,
+        # one key at a time (reverse=True keeps ties in input order).
+        out = list(rows)
+        for col, asc, kf in reversed(pairs):
+            out.sort(key=lambda r, _col=col, _kf=kf: _kf(r.get(_col, None)), reverse=not asc)
+        return out
+
+    def _project(self, row: Dict[str, Any], cols: List[str]) -> Dict[str, Any]:
+        if cols == ["*"]:
+            return row
+        return {c: row.get(c, None) for c in cols}
+
+    def _parse_kv_list(self, s: str) -> Dict[str, str]:
+        out: Dict[str, str] = {}
+        pos, n = 0, len(s)
+        while pos < n:
+            ch = s[pos]
+            if ch in " \t," :
+                pos += 1
+                continue
+            m = _KV_RE.match(s, pos)
+            if not m:
+                raise ValueError(f"Invalid key=value pair: {s[pos:].strip()}")
+            out[m.group(1)] = m.group(2).strip()
+            pos = m.end()
+        return out
+
+    def _read_rows(self, table: str) -> List[Tuple[int, Dict[str, Any]]]:
+        """
+        Parse the table's NDJSON into (line_nr, row) pairs, cached per table.
+        The cache is keyed on (mtime, size); because tables are append-only,
+        a file that only grew needs just the new tail parsed.
+        """
+        ndjson = _p(self.data_dir, table, "ndjson")
+        try:
+            st = os.stat(ndjson)
+        except OSError:
+            return []
+        cached = self._rows_cache.get(table)
+        if cached is not None and cached[0] == st.st_mtime and cached[1] == st.st_size:
+            return cached[3]
+        start, nlines = 0, 0
+        rows_with_line: List[Tuple[int, Dict[str, Any]]] = []
+        if cached is not None and st.st_size > cached[1]:
+            start, nlines = cached[1], cached[2]
+            rows_with_line = list(cached[3])
+        else:
+            # cold start: a parquet shadow (see compact) covers the file up
+            # to its watermark, leaving only the appended tail to parse
+            snap = self._load_compacted(table)
+            if snap is not None and st.st_size >= snap[0]:
+                start, nlines = snap[0], snap[1]
+                rows_with_line = snap[2]
+        with open(ndjson, "rb") as f:
+            if start:
+                # appended tail: small, read it outright
+                f.seek(start)
+                data = f.read()
+            else:
+                try:
+                    data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                except (ValueError, OSError):  # empty file, exotic fs
+                    data = f.read()
+        last = nlines - 1
+        if _simd_parser is not None:
+            parse = _simd_parser.parse
+            for last, seg in _iter_ndjson_bytes(data, nlines):
+                if seg is not None:
+                    rows_with_line.append((last, parse(seg).as_dict()))
+        else:
+            for last, seg in _iter_ndjson_bytes(data, nlines):
+                if seg is not None:
+                    rows_with_line.append((last, _loads(seg)))
+        nlines = last + 1
+        self._rows_cache[table] = (st.st_mtime, st.st_size, nlines, rows_with_line)
+        return rows_with_line
+
+    def _read_lines(self, table: str, line_nrs) -> List[Tuple[int, Dict[str, Any]]]:
+        """
+        Parse only the given line numbers, in line order. Serves the index
+        pushdown path; reuses the rows cache when it is already valid, and
+        otherwise single-passes the file skipping unwanted lines unparsed.
+        """
+        wanted = set(line_nrs)
+        if not wanted:
+            return []
+        ndjson = _p(self.data_dir, table, "ndjson")
+        try:
+            st = os.stat(ndjson)
+        except OSError:
+            return []
+        cached = self._rows_cache.get(table)
+        if cached is not None and cached[0] == st.st_mtime and cached[1] == st.st_size:
+            return [(i, r) for i, r in cached[3] if i in wanted]
+        out: List[Tuple[int, Dict[str, Any]]] = []
+        offsets = self._load_offsets(table)
+        with open(ndjson, "rb") as f:
+            if offsets and max(wanted) < len(offsets):
+                # random access: one seek + readline per match
+                for i in sorted(wanted):
+                    f.seek(offsets[i])
+                    line = f.readline()
+                    if line.strip():
+                        out.append((i, _loads(line)))
+            else:
+                for i, line in enumerate(f):
+                    if i in wanted and line.strip():
+                        out.append((i, _loads(line)))
+        return out
+
+    def _offsets_path(self, table: str) -> str:
+        return _p(self.data_dir, table, "offsets.bin")
+
+    def _append_offset(self, table: str, offset: int, line_nr: int):
+        path = self._offsets_path(table)
+        try:
+            entries = os.stat(path).st_size // 8
+        except OSError:
+            return  # legacy table: built lazily on first random-access read
+        if entries == line_nr:
+            with open(path, "ab") as f:
+                f.write(struct.pack("<Q", offset))
+        # else the file is behind (e.g. interrupted writer); _load_offsets
+        # catches up from its last valid entry instead of appending out of order
+        self._offsets_cache.pop(table, None)
+
+    def _load_offsets(self, table: str) -> List[int]:
+        """
+        Byte offset of every NDJSON line, from <table>.offsets.bin. Missing
+        or lagging files are (re)built by scanning only the uncovered tail;
+        a full rebuild happens only if the NDJSON shrank underneath us.
+        """
+        ndjson = _p(self.data_dir, table, "ndjson")
+        try:
+            size = os.stat(ndjson).st_size
+        except OSError:
+            return []
+        cached = self._offsets_cache.get(table)
+        if cached is not None and cached[0] == size:
+            return cached[1]
+        path = self._offsets_path(table)
+        offsets: List[int] = []
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                data = f.read()
+            n = len(data) // 8
+            if n:
+                offsets = list(struct.unpack(f"<{n}Q", data[: n * 8]))
+        rebuilt = bool(offsets) and offsets[-1] >= size
+        if rebuilt:
+            offsets = []
+        new: List[int] = []
+        with open(ndjson, "rb") as f:
+            if offsets:
+                f.seek(offsets[-1])
+                f.readline()  # the line the last recorded offset points to
+            pos = f.tell()
+            while pos < size:
+                if not f.readline():
+                    break
+                new.append(pos)
+                pos = f.tell()
+        if new or rebuilt or not os.path.exists(path):
+            with open(path, "wb" if rebuilt else "ab") as f:
+                f.write(struct.pack(f"<{len(new)}Q", *new))
+            offsets.extend(new)
+        self._offsets_cache[table] = (size, offsets)
+        return offsets
+
+    def _line_count(self, table: str) -> int:
+        """Current NDJSON line count, seeded once from the offsets sidecar."""
+        c = self._line_counts.get(table)
+        if c is None:
+            c = len(self._load_offsets(table))
+            self._line_counts[table] = c
+        return c
+
+    def _has_index(self, table: str, column: str) -> bool:
+        return os.path.exists(_p(self.data_dir, table, f"{column}.idx.json"))
+
+    def _indexed_columns(self, table: str) -> List[str]:
+        cols = self._indexes.get(table)
+        if cols is None:
+            cols = []
+            prefix, suffix = f"{table}.", ".idx.json"
+            with os.scandir(self.data_dir) as it:
+                for e in it:
+                    if e.name.startswith(prefix) and e.name.endswith(suffix):
+                        cols.append(e.name[len(prefix):-len(suffix)])
+            self._indexes[table] = cols
+        return cols
+
+    def _load_index(self, table: str, column: str) -> Dict[str, List[int]]:
+        """
+        Fold the base snapshot plus the append log into a key -> line numbers
+        dict, cached like the rows cache: if only the log grew, fold just its
+        tail into the cached dict.
+        """
+        base_path = _p(self.data_dir, table, f"{column}.idx.json")
+        log_path = _p(self.data_dir, table, f"{column}.idx.ndjson")
+        try:
+            base_mtime = os.stat(base_path).st_mtime
+        except OSError:
+            base_mtime = 0.0
+        try:
+            log_size = os.stat(log_path).st_size
+        except OSError:
+            log_size = 0
+        cached = self._idx_cache.get((table, column))
+        if cached is not None and cached[0] == base_mtime and cached[1] == log_size:
+            return cached[2]
+        start = 0
+        if cached is not None and cached[0] == base_mtime and log_size > cached[1]:
+            idx, start = cached[2], cached[1]
+        else:
+            idx = _load_json(base_path, {})
+        if log_size > start:
+            with open(log_path, "rb") as f:
+                f.seek(start)
+                for line in f:
+                    if line.strip():
+                        entry = _loads(line)
+                        idx.setdefault(entry["k"], []).append(entry["l"])
+        self._idx_cache[(table, column)] = (base_mtime, log_size, idx)
+        return idx
+
+    def _idx_lookup(self, table: str, column: str, value: Any) -> List[int]:
+        key = json.dumps(value, ensure_ascii=False)
+        return self._load_index(table, column).get(key, [])
+
+    def _update_indexes_after_insert(self, table: str, row: Dict[str, Any], line_nr: int):
+        for col in self._indexed_columns(table):
+            key = json.dumps(row.get(col, None), ensure_ascii=False)
+            with open(_p(self.data_dir, table, f"{col}.idx.ndjson"), "ab") as f:
+                f.write(_dumps_line({"k": key, "l": line_nr}))
+
+    def _counter_path(self, table: str) -> str:
+        return _p(self.data_dir, table, "counter.json")
+
+    def _save_counter(self, table: str, next_id: int):
+        # write-then-replace so a crashed writer never leaves a torn counter
+        path = self._counter_path(table)
+        tmp = path + ".tmp"
+        _save_json(tmp, {"next_id": next_id})
+        os.replace(tmp, path)
+
+    def _bump_counter(self, table: str, candidate: int):
+        counter = _load_json(self._counter_path(table), None)
+        if counter is None:
+            self._save_counter(table, max(candidate, self._scan_max_id(table) + 1))
+        elif candidate > int(counter.get("next_id", 1)):
+            self._save_counter(table, candidate)
+
+    def _next_id(self, table: str) -> int:
+        """
+        Allocate the next id from the counter sidecar in O(1).
+        Legacy tables without a counter get a one-time full scan,
+        after which the result is persisted.
+        """
+        counter = _load_json(self._counter_path(table), None)
+        if counter is None:
+            next_id = self._scan_max_id(table) + 1
+        else:
+            next_id = int(counter.get("next_id", 1))
+        self._save_counter(table, next_id + 1)
+        return next_id
+
+    def _scan_max_id(self, table: str) -> int:
+        """Find the highest id in the table by scanning the NDJSON. 0 if empty."""
+        ndjson = _p(self.data_dir, table, "ndjson")
+        max_id = 0
+        if os.path.exists(ndjson):
+            with open(ndjson, "rb") as f:
+                try:
+                    data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                except (ValueError, OSError):
+                    data = f.read()
+            if _simd_parser is not None:
+                # Pull only the id field; no need to materialize full dicts.
+                parse = _simd_parser.parse
+                for _i, seg in _iter_ndjson_bytes(data):
+                    if seg is None:
+                        continue
+                    try:
+                        rid = int(parse(seg)["id"])
+                        if rid > max_id:
+                            max_id = rid
+                    except Exception:
+                        continue
+            else:
+                for _i, seg in _iter_ndjson_bytes(data):
+                    if seg is None:
+                        continue
+                    try:
+                        r = _loads(seg)
+                        if "id" in r and r["id"] is not None:
+                            rid = int(r["id"])
+                            if rid > max_id:
+                                max_id = rid
+                    except Exception:
+                        continue
+        return max_id
+
+# ============ CLI ============
+def main():
+    parser = argparse.ArgumentParser(description="Mini append-only SQL (versioned rows + soft-delete).")
+    parser.add_argument("--data-dir", default=DATA_DIR_DEFAULT, help="Directory for data files")
+    parser.add_argument("--pretty", action="store_true", help="Pretty-print JSON output")
+    # global output options
+    parser.add_argument("--output", choices=["json", "table"], default="json", help="Output format")
+    parser.add_argument("--ascii", action="store_true", help="ASCII borders in table")
+    parser.add_argument("--max-col-width", type=int, default=48, help="Max column width in table")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p_ct = sub.add_parser("create-table", help="Create a table")
+    p_ct.add_argument("table")
+    p_ct.add_argument("--cols", required=True, help='E.g. "name:text, email:text" (system columns are auto-added)')
+
+    sub.add_parser("list-tables", help="List tables")
+
+    p_ss = sub.add_parser("show-schema", help="Show schema")
+    p_ss.add_argument("table")
+
+    p_ins = sub.add_parser("insert", help="Insert (or update) a row as a new version (append). id is optional (auto-increment).")
+    p_ins.add_argument("table")
+    p_ins.add_argument("--values", required=True, help='E.g. "name=\'John\', email=\'john@example.com\'" or "id=1, name=\'John\'"')
+    p_ins.add_argument("--user", help="Override user for this insert")
+
+    p_insm = sub.add_parser("insert-many", help="Batch insert: one values expression per line from a file (- for stdin)")
+    p_insm.add_argument("table")
+    p_insm.add_argument("--values-file", required=True, help='File with one --values style line per row, e.g. "name=\'John\'"')
+    p_insm.add_argument("--user", help="Override user for this batch")
+
+    p_deact = sub.add_parser("deactivate", help="Soft-delete: append a version with active=false")
+    p_deact.add_argument("table")
+    p_deact.add_argument("id")
+    p_deact.add_argument("--user", help="Override user for this deactivate")
+
+    p_sel = sub.add_parser("select", help="Select (default: latest version per id)")
+    p_sel.add_argument("table")
+    p_sel.add_argument("--cols", default="*", help='"id,name" or "*"')
+    p_sel.add_argument("--where", default=None, help='E.g. "active = true AND id >= 1"')
+    p_sel.add_argument("--history", action="store_true", help="Show all versions (chronological)")
+    p_sel.add_argument("--order", default=None, help='ORDER BY, e.g.: "name ASC, timestamp DESC"')
+    p_sel.add_argument("--vectorized", action="store_true", help="Force the pandas columnar path (needs pandas)")
+
+    p_hist = sub.add_parser("show-history", help="Show all versions for one id")
+    p_hist.add_argument("table")
+    p_hist.add_argument("id")
+
+    p_cmp = sub.add_parser("compact", help="Roll the table into a Parquet shadow for faster scans (needs pyarrow)")
+    p_cmp.add_argument("table")
+
+    p_cix = sub.add_parser("create-index", help="Create index on column")
+    p_cix.add_argument("table"); p_cix.add_argument("column")
+    p_dix = sub.add_parser("drop-index", help="Drop index")
+    p_dix.add_argument("table"); p_dix.add_argument("column")
+
+    args = parser.parse_args()
+    eng = MiniEngine(args.data_dir)
+
+    def print_json(obj):
+        print(json.dumps(obj, ensure_ascii=False, indent=2 if args.pretty else None))
+
+    try:
+        if args.cmd == "create-table":
+            eng.create_table(args.table, args.cols)
+            print_json({"ok": True, "table": args.table})
+
+        elif args.cmd == "list-tables":
+            tables = eng.list_tables()
+            if args.output == "table":
+                rows = [{"table": t} for t in tables]
+                _print_table_from_dicts(rows, ["table"], args.max_col_width, args.ascii)
+            else:
+                print_json(tables)
+
+        elif args.cmd == "show-schema":
+            schema = eng.show_schema(args.table)
+            if args.output == "table":
+                rows = [{"column": k, "type": v} for k, v in schema.items()]
+                _print_table_from_dicts(rows, ["column", "type"], args.max_col_width, args.ascii)
+            else:
+                print_json(schema)
+
+        elif args.cmd == "insert":
+            if args.user:
+                os.environ["SQL_USER"] = args.user
+            row = eng.insert(args.table, args.values)
+            print_json({"ok": True, "inserted": row})
+
+        elif args.cmd == "insert-many":
+            if args.user:
+                os.environ["SQL_USER"] = args.user
+            if args.values_file == "-":
+                exprs = [ln.strip() for ln in sys.stdin if ln.strip()]
+            else:
+                with open(args.values_file, "r", encoding="utf-8") as fh:
+                    exprs = [ln.strip() for ln in fh if ln.strip()]
+            rows = eng.insert_many(args.table, exprs)
+            print_json({"ok": True, "inserted": len(rows)})
+
+        elif args.cmd == "deactivate":
+            if args.user:
+                os.environ["SQL_USER"] = args.user
+            row = eng.deactivate(args.table, _parse_value(args.id))
+            print_json({"ok": True, "deactivated": row})
+
+        elif args.cmd == "select":
+            cols = [c.strip() for c in args.cols.split(",")] if args.cols.strip() != "*" else ["*"]
+
+            # ORDER parsing + pass to engine (schema fetched once for the command)
+            schema = eng.show_schema(args.table)
+            eng._order_keys = eng._parse_order(schema, args.order)
+            eng._vectorized = args.vectorized
+
+            rows = eng.select(args.table, cols, args.where, history=args.history)
+            if args.output == "table":
+                headers = list(schema.keys()) if cols == ["*"] else cols
+                dict_rows = [{k: r.get(k, "") for k in headers} for r in rows]
+                _print_table_from_dicts(dict_rows, headers, args.max_col_width, args.ascii)
+            else:
+                print_json(rows)
+
+        elif args.cmd == "show-history":
+            idval = _parse_value(args.id)
+            hist = eng.show_history(args.table, idval)
+            if args.output == "table":
+                schema = eng.show_schema(args.table)
+                headers = ["line"] + list(schema.keys())
+                dict_rows = []
+                for item in hist:
+                    row = {"line": item.get("line", "")}
+                    raw = item.get("row", {})
+                    for k in schema.keys():
+                        row[k] = raw.get(k, "")
+                    dict_rows.append(row)
+                _print_table_from_dicts(dict_rows, headers, args.max_col_width, args.ascii)
+            else:
+                print_json(hist)
+
+        elif args.cmd == "compact":
+            info = eng.compact(args.table)
+            print_json({"ok": True, "compacted": dict(info, table=args.table)})
+
+        elif args.cmd == "create-index":
+            eng.create_index(args.table, args.column)
+            print_json({"ok": True, "index": {"table": args.table, "column": args.column}})
+
+        elif args.cmd == "drop-index":
+            eng.drop_index(args.table, args.column)
+            print_json({"ok": True, "dropped": {"table": args.table, "column": args.column}})
+
+        else:
+            parser.error("Unknown subcommand.")
+
+    except Exception as e:
+        print(json.dumps({"ok": False, "error": str(e)}), file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()